@@ -7,13 +7,18 @@ user once the transcoding has been started.
 """
 
 import os
+import io
+import sys
 import time
+import queue
+import threading
 
 import click
 import progressbar
 import blessed
 
 from filmalize.errors import ProbeError, ProgressFinishedError
+from filmalize.models import ProbeCache
 from filmalize.cli_models import Writer, ErrorWriter, CliContainer
 from filmalize.menus import main_menu
 
@@ -21,6 +26,11 @@ from filmalize.menus import main_menu
 # Allow help to be called with '-h' as well as the default '--help'.
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
+# Synchronized output escape sequences. Terminals that support them draw
+# everything written between the two at once; others ignore them.
+BEGIN_SYNC = '\x1b[?2026h'
+END_SYNC = '\x1b[?2026l'
+
 
 def exclusive(ctx_params, exclusive_params, error_message):
     """Utility function for enforcing exclusivity between click options.
@@ -59,18 +69,116 @@ def exclusive(ctx_params, exclusive_params, error_message):
 
     """
 
-    if sum([1 if ctx_params[p] else 0 for p in exclusive_params]) > 1:
+    if sum(1 for p in exclusive_params if ctx_params[p]) > 1:
         raise click.UsageError(error_message)
 
 
+def walk_directory(directory):
+    """Utility function to recursively list the files in a directory.
+
+    Note:
+        Directories are scanned concurrently by a pool of worker threads, which
+        pays off when per-directory latency is high (network mounts, etc.).
+        Symbolic links to files are listed, but symbolic links to directories
+        are not followed, and directories that cannot be read are skipped, as
+        with :obj:`os.walk`.
+
+    Args:
+        directory (:obj:`str`): The directory to search.
+
+    Returns:
+        :obj:`list` of :obj:`str`: The paths of the files found, in no
+        particular order.
+
+    """
+
+    dir_queue = queue.Queue()
+    dir_queue.put(directory)
+    files = []
+    lock = threading.Lock()
+
+    def scan():
+        """Scan directories from the queue until a None sentinel arrives."""
+        while True:
+            path = dir_queue.get()
+            if path is None:
+                break
+            found = []
+            try:
+                for dir_entry in os.scandir(path):
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        dir_queue.put(dir_entry.path)
+                    elif dir_entry.is_file():
+                        found.append(dir_entry.path)
+            except OSError:
+                pass
+            finally:
+                with lock:
+                    files.extend(found)
+                dir_queue.task_done()
+
+    workers = [threading.Thread(target=scan, daemon=True)
+               for _ in range(min(8, os.cpu_count() or 1))]
+    for worker in workers:
+        worker.start()
+    dir_queue.join()
+    for _ in workers:
+        dir_queue.put(None)
+    for worker in workers:
+        worker.join()
+
+    return files
+
+
+def scan_files(file_list, ordered=False):
+    """Utility generator to probe files concurrently.
+
+    Note:
+        Files are probed with :obj:`Container.from_files`, and ffprobe output
+        is cached between runs in a :obj:`ProbeCache`.
+
+    Args:
+        file_list (:obj:`list` of :obj:`str`): File names to attempt to build
+            into containers.
+        ordered (:obj:`bool`, optional): If True, the futures are yielded in
+            the order of `file_list` rather than in the order that the probes
+            complete.
+
+    Yields:
+        :obj:`concurrent.futures.Future`: The future for each file. The result
+        of each future is a :obj:`CliContainer`, or :obj:`ProbeError` is
+        raised.
+
+    """
+
+    cache = ProbeCache()
+    try:
+        yield from CliContainer.from_files(file_list, cache, ordered=ordered)
+    finally:
+        cache.close()
+
+
+def echo_probe_error(error):
+    """Utility function to warn the user that a file could not be probed.
+
+    Args:
+        error (:obj:`ProbeError`): The error to display.
+
+    """
+
+    click.secho('Warning: unable to process {}'.format(error.file_name),
+                fg='red')
+    click.echo(error.message)
+
+
 def build_containers(file_list):
     """Utility function to build a list of :obj:`Container` instances given a
     list of filenames.
 
     Note:
-        If a container fails to build as the result of a ffprobe error, that
-        error is echoed after building has completed. If no containers are
-        built, an empty list is returned.
+        Files are probed with :obj:`scan_files`. If a container fails to build
+        as the result of a ffprobe error, that error is echoed after building
+        has completed. If no containers are built, an empty list is returned.
 
     Args:
         file_list (:obj:`list` of :obj:`str`): File names to attempt to build
@@ -83,16 +191,23 @@ def build_containers(file_list):
 
     containers = []
     errors = []
-    with click.progressbar(file_list, label='Scanning Files') as pr_bar:
-        for file_name in pr_bar:
+    # Redraw the progress bar at most once per percent.
+    step = max(1, len(file_list) // 100)
+    pending = 0
+    with click.progressbar(length=len(file_list),
+                           label='Scanning Files') as pr_bar:
+        for future in scan_files(file_list):
             try:
-                containers.append(CliContainer.from_file(file_name))
+                containers.append(future.result())
             except ProbeError as _e:
                 errors.append(_e)
+            pending += 1
+            if pending >= step:
+                pr_bar.update(pending)
+                pending = 0
+        pr_bar.update(pending)
     for error in errors:
-        click.secho('Warning: unable to process {}'
-                    .format(error.file_name), fg='red')
-        click.echo(error.message)
+        echo_probe_error(error)
     return sorted(containers, key=lambda container: container.file_name)
 
 
@@ -128,11 +243,7 @@ def cli(ctx, single_file, directory, recursive):
     else:
         directory = directory if directory else '.'
         if recursive:
-            ctx.obj['FILES'] = sorted(
-                [os.path.join(root, single_file)
-                 for root, dirs, files in os.walk(directory)
-                 for single_file in files]
-            )
+            ctx.obj['FILES'] = sorted(walk_directory(directory))
         else:
             ctx.obj['FILES'] = sorted(
                 [dir_entry.path for dir_entry in os.scandir(directory)
@@ -145,8 +256,13 @@ def cli(ctx, single_file, directory, recursive):
 def display(ctx):
     """Display information about video file(s)"""
 
-    for container in build_containers(ctx.obj['FILES']):
-        container.display()
+    # Each file is displayed as soon as it and the files before it have been
+    # probed, so the output is incremental but in a stable order.
+    for future in scan_files(ctx.obj['FILES'], ordered=True):
+        try:
+            future.result().display()
+        except ProbeError as _e:
+            echo_probe_error(_e)
 
 
 @cli.command()
@@ -157,26 +273,30 @@ def convert(ctx):
     containers = build_containers(ctx.obj['FILES'])
     running = main_menu(containers)
     terminal = blessed.Terminal()
-    err = ErrorWriter(terminal)
+    # Errors are written below the total and per-file progress bars.
+    err = ErrorWriter(terminal, len(running) + 3)
+    screen = io.StringIO()
 
-    padding = max([len(container.file_name) for container in running])
+    padding = max(len(container.file_name) for container in running)
     for line_number, container in enumerate(running):
-        container.add_progress(terminal, line_number + 2, padding)
+        container.add_progress(terminal, line_number + 2, padding, screen)
 
-    writer = Writer(0, terminal, 'bold_blue_on_black')
-    total_ms = sum([container.microseconds for container in running])
+    writer = Writer(0, terminal, 'bold_blue_on_black', screen)
+    total_ms = sum(container.microseconds for container in running)
     widgets = [progressbar.Percentage(), ' ', progressbar.Bar(),
                ' ', progressbar.Timer(), ' | ', progressbar.ETA()]
     pr_bar = progressbar.ProgressBar(max_value=total_ms, widgets=widgets,
                                      fd=writer)
 
-    with terminal.fullscreen():
+    with terminal.fullscreen(), terminal.hidden_cursor():
+        next_tick = time.monotonic()
         while running:
             total_progress = 0
+            still_running = []
             for container in running:
                 try:
                     progress = container.progress
-                    container.pr_bar.update(progress)
+                    container.update_progress(progress)
                 except (ProgressFinishedError) as _e:
                     if container.process.returncode:
                         err.write('Warning: ffmpeg error while converting '
@@ -184,14 +304,28 @@ def convert(ctx):
                         err.write(container.process.communicate()[1]
                                   .strip(os.linesep))
 
-                    running.remove(container)
                     progress = container.microseconds
                     container.pr_bar.finish()
+                else:
+                    still_running.append(container)
 
                 total_progress += progress
 
+            running = still_running
             pr_bar.update(total_progress)
-            time.sleep(0.2)
+            output = screen.getvalue()
+            if output:
+                if terminal.does_styling:
+                    output = BEGIN_SYNC + output + END_SYNC
+                sys.stdout.write(output)
+                sys.stdout.flush()
+                screen.seek(0)
+                screen.truncate()
+
+            # Refresh on a fixed schedule rather than sleeping a fixed time
+            # after each pass, but don't try to catch up after a slow pass.
+            next_tick = max(next_tick + 0.2, time.monotonic())
+            time.sleep(max(0, next_tick - time.monotonic()))
 
     pr_bar.finish()
     click.clear()
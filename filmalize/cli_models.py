@@ -5,11 +5,12 @@ core classes extended with additional functionality for command-line use.
 
 """
 
+import sys
+
 import click
 import progressbar
 
-from filmalize.models import Container, ContainerLabel, Stream, SubtitleFile
-from filmalize.errors import ProbeError
+from filmalize.models import Container, Stream, SubtitleFile
 
 
 class SelectStreams(click.ParamType):
@@ -55,37 +56,52 @@ class Writer(object):
         terminal (:obj:`blessed.terminal.Terminal`): Where to write.
         color (:obj:`str`, optional): The color to print in. Must conform to
             the blessed color function `format`_.
+        buffer (:obj:`io.StringIO`, optional): If specified, messages are
+            accumulated here instead of being printed immediately, so that the
+            output of several instances can be written to the screen at once.
 
     Attributes:
         line (:obj:`int`): The line of the screen that this instance writes
             to.
         terminal (:obj:`blessed.terminal.Terminal`): Where to write.
         color (:obj:`str`): The color to print in.
+        buffer (:obj:`io.StringIO`): Where to accumulate messages, if set.
 
     .. _format: http://blessed.readthedocs.io/en/latest/overview.html#colors
     """
 
-    def __init__(self, line, terminal, color=None):
+    def __init__(self, line, terminal, color=None, buffer=None):
 
         self.line = line
         self.terminal = terminal
         self.color = color
+        self.buffer = buffer
+        self._last_message = None
+        self._move = terminal.move(line, 0)
+        self._style = getattr(terminal, color) if color else str
 
     def write(self, message):
         """Write a message to the screen.
 
         The message is written to the :obj:`Writer.terminal`, on the
-        :obj:`Writer.line`, and in :obj:`Writer.color`, if set.
+        :obj:`Writer.line`, and in :obj:`Writer.color`, if set. If
+        :obj:`Writer.buffer` is set, the message is appended to it rather than
+        printed. A message identical to the previous one is not written again.
+
+        Note:
+            The cursor is left after the message rather than being returned to
+            its previous position.
 
         Args:
             message (:obj:`str`): The message to display
 
         """
-        with self.terminal.location(x=0, y=self.line):
-            if self.color:
-                print(getattr(self.terminal, self.color)(message))
-            else:
-                print(message)
+        if message == self._last_message:
+            return
+        self._last_message = message
+
+        output = self.buffer if self.buffer is not None else sys.stdout
+        output.write(self._move + self._style(message) + '\n')
 
     @staticmethod
     def flush():
@@ -104,31 +120,35 @@ class Writer(object):
 
 
 class ErrorWriter(object):
-    """Write error messages in bright red to the bottom of a Terminal.
+    """Write error messages in bright red below the progress bars on a
+    Terminal.
 
     Args:
         terminal (:obj:`blessed.terminal.Terminal`): Where to write.
+        line (:obj:`int`): The line to write the first message to.
 
     Attributes:
         terminal (:obj:`blessed.terminal.Terminal`): Where to write.
-        line (:obj:`int`): The highest line to write to. Starts at the bottom
-            of the screen and increments upward as additional messages are
-            written.
+        line (:obj:`int`): The next line to write to. Increments downward as
+            additional messages are written.
         messages (:obj:`list` of :obj:`str`): The messages to write.
 
     """
 
-    def __init__(self, terminal):
+    def __init__(self, terminal, line):
 
         self.terminal = terminal
-        self.line = terminal.height - 1
+        self.line = line
         self.messages = []
 
     def write(self, message):
-        """Add a message to the list and display all  messages at the bottom of
-        the Terminal.
+        """Add a message to the list and display it below the previous
+        message.
 
-        As subsequent messages are written, earlier messages are moved upward.
+        Each message is written once, so earlier messages are not redrawn.
+        Once a message does not fit above the bottom of the Terminal, it and
+        any later messages are only added to the list, since writing past the
+        bottom would scroll the progress bars out of place.
 
         Args:
             message (:obj:`str`): The message to display.
@@ -136,10 +156,15 @@ class ErrorWriter(object):
         """
 
         self.messages.append(message)
+        width = max(1, self.terminal.width)
+        rows = sum(1 + max(0, self.terminal.length(line) - 1) // width
+                   for line in message.split('\n'))
+        if self.line + rows > self.terminal.height - 1:
+            self.line = self.terminal.height
+            return
         with self.terminal.location(x=0, y=self.line):
-            for message in self.messages:
-                print(self.terminal.red(message), self.terminal.clear_eol)
-        self.line -= 1
+            print(self.terminal.red(message) + self.terminal.clear_eol)
+        self.line += rows
 
 
 class CliContainer(Container):
@@ -155,42 +180,34 @@ class CliContainer(Container):
     Attributes:
         writer (:obj:`Writer`): Object with which to write.
         pr_bar (:obj:`progressbar.bar.ProgressBar`): Progress bar to write.
+        percent (:obj:`int`): The percentage last displayed by the progress
+            bar.
 
     """
 
     def __init__(self, writer=None, pr_bar=None, **kwargs):
         self.writer = writer
         self.pr_bar = pr_bar
+        self.percent = None
         super().__init__(**kwargs)
 
-    @classmethod
-    def from_dict(cls, info):
-        """Build a :obj:`CliContainer` from a given dictionary.
+    @staticmethod
+    def stream_from_dict(info):
+        """Build a :obj:`CliStream` for this container.
 
         Args:
-            info (:obj:`dict`): Container information in dictionary format
+            info (:obj:`dict`): Stream information in dictionary format
                 structured in the manner of ffprobe json output.
 
         Returns:
-            :obj:`CliContainer`: Instance representing the given info.
-
-        Raises:
-            :obj:`ProbeError`: If the info does not contain a 'duraton' tag.
+            :obj:`CliStream`: Instance populated with data from the given
+            dictionary.
 
         """
 
-        file_name = info['format']['filename']
-        duration = float(info.get('format', {}).get('duration', 0))
-        if not duration:
-            raise ProbeError(file_name, 'File has no duration tag.')
-
-        streams = [CliStream.from_dict(stream) for stream in info['streams']]
-        labels = ContainerLabel.from_dict(info)
+        return CliStream.from_dict(info)
 
-        return cls(file_name=file_name, duration=duration, streams=streams,
-                   labels=labels)
-
-    def add_progress(self, terminal, line_number, padding):
+    def add_progress(self, terminal, line_number, padding, buffer=None):
         """Build a :obj:`progressbar.bar.Progressbar` instance for this
         Container.
 
@@ -200,16 +217,33 @@ class CliContainer(Container):
             line_number (:obj:`int`): The line number to display on.
             padding (:obj:`int`): The number of characters to pad the filename
                 with.
+            buffer (:obj:`io.StringIO`, optional): Buffer for the
+                :obj:`Writer` to accumulate output in.
 
         """
 
         label = '{name:{length}}'.format(name=self.file_name, length=padding)
         widgets = [label, ' | ', progressbar.Percentage(), ' ',
                    progressbar.Bar(), ' ', progressbar.ETA()]
-        self.writer = Writer(line_number, terminal, 'red_on_black')
+        self.writer = Writer(line_number, terminal, 'red_on_black', buffer)
         self.pr_bar = progressbar.ProgressBar(
             max_value=self.microseconds, widgets=widgets, fd=self.writer)
 
+    def update_progress(self, progress):
+        """Update the progress bar, but only if the whole percentage of the
+        conversion that has been completed has changed since the last update.
+
+        Args:
+            progress (:obj:`int`): The number of microseconds that have been
+                processed.
+
+        """
+
+        percent = progress * 100 // self.microseconds
+        if percent != self.percent:
+            self.percent = percent
+            self.pr_bar.update(progress)
+
     def display(self):
         """Echo a pretty representation of this Container."""
         click.secho('*** File: {} ***'.format(self.file_name), fg='magenta')
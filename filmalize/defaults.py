@@ -9,3 +9,4 @@ C_SUBS = 'mov_text'
 BITRATE = 384
 CRF = 18
 PRESET = 'slow'
+PROBE_CACHE = '~/.cache/filmalize/probe.db'
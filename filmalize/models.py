@@ -9,17 +9,125 @@ class is the :obj:`Container`, which may be created manually, or with the
 
 import os
 import datetime
+import functools
+import weakref
+import concurrent.futures
 import tempfile
 import subprocess
-import json
-import pathlib
-
-import chardet
-import bitmath
+import sqlite3
+import zlib
+import threading
+
+try:
+    from cchardet import detect
+except ImportError:
+    try:
+        from charset_normalizer import detect
+    except ImportError:
+        from chardet import detect
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 import filmalize.defaults as defaults
 from filmalize.errors import ProbeError, ProgressFinishedError
 
+#: The ffprobe entries read by the from_dict methods. Nothing else is
+#: requested, to keep the probe output small.
+PROBE_ENTRIES = ':'.join([
+    'format=filename,duration,size,bit_rate,format_long_name',
+    'format_tags=title',
+    'stream=index,codec_type,codec_name,bit_rate,height,coded_height,width,'
+    'coded_width,channel_layout',
+    'stream_tags=title,language',
+    'stream_disposition=default',
+])
+
+# pysimdjson parsers are reusable but not thread safe, so keep one per thread.
+_PARSERS = threading.local()
+
+
+def _run_ffprobe(file_name):
+    """Run ffprobe on a file and return its raw json output."""
+
+    probe_response = subprocess.run(
+        [defaults.FFPROBE, '-v', 'error', '-show_entries', PROBE_ENTRIES,
+         '-of', 'json', file_name],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True
+    )
+    if probe_response.returncode:
+        raise ProbeError(file_name, probe_response.stderr.decode('utf-8')
+                         .strip(os.linesep))
+
+    return probe_response.stdout
+
+
+@functools.lru_cache(maxsize=512)
+def _run_ffprobe_memoized(file_name, _path, _mtime_ns, _size):
+    """Run ffprobe, remembering the output for each version of each file.
+
+    Only the file name is used; the rest of the ProbeCache key is passed so
+    that a changed file is memoized separately.
+
+    """
+
+    return _run_ffprobe(file_name)
+
+
+def _probe_output(file_name):
+    """Return the ffprobe json output for a file, running ffprobe only if the
+    file has changed since it was last probed by this process."""
+
+    key = ProbeCache.key(file_name)
+    if key is None:
+        return _run_ffprobe(file_name)
+    return _run_ffprobe_memoized(file_name, *key)
+
+
+def _parse_lazy(data):
+    """Parse json, without building Python objects for unused entries if
+    pysimdjson is installed.
+
+    The returned document should be consumed right away, since its parser is
+    reused for the next call in the same thread.
+
+    """
+
+    if simdjson is None:
+        return _json.loads(data)
+    parser = getattr(_PARSERS, 'parser', None)
+    if parser is not None:
+        try:
+            return parser.parse(data)
+        except RuntimeError:
+            # A previous document is still referenced (by a traceback, for
+            # instance), so this parser can't be reused.
+            pass
+    parser = _PARSERS.parser = simdjson.Parser()
+    return parser.parse(data)
+
+
+def _remove_temp_file(temp_file):
+    """Close and delete a temporary file created with delete=False."""
+
+    temp_file.close()
+    try:
+        os.unlink(temp_file.name)
+    except OSError:
+        pass
+
 
 class EqualityMixin(object):
     """Mixin class that adds equality checking.
@@ -30,16 +138,18 @@ class EqualityMixin(object):
 
         To exclude attributes from the comparison, add an attribute
         :obj:`equality_ignore` to the class. Populate this attribute with a
-        :obj:`list` of :obj:`str` names of attributes to exclude.
+        :obj:`frozenset` of :obj:`str` names of attributes to exclude.
 
     """
 
+    __hash__ = None
+
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            diff = [other.__dict__[key] == value
-                    for key, value in self.__dict__.items()
-                    if key not in getattr(self, 'equality_ignore', [])]
-            return sum(diff) == len(diff)
+            ignore = getattr(self, 'equality_ignore', ())
+            return all(other.__dict__.get(key) == value
+                       for key, value in self.__dict__.items()
+                       if key not in ignore)
         else:
             return NotImplemented
 
@@ -94,13 +204,15 @@ class ContainerLabel(EqualityMixin):
             Instance populated wtih data from the given dictionary.
 
         """
-        title = info.get('format', {}).get('tags', {}).get('title', '')
-        f_bytes = int(info.get('format', {}).get('size', 0))
-        size = round(bitmath.MiB(bytes=f_bytes).value, 2) if f_bytes else ''
-        bits = int(info.get('format', {}).get('bit_rate', 0))
-        bitrate = round(bitmath.Mib(bits=bits).value, 2) if bits else ''
-        container_format = info.get('format', {}).get('format_long_name', '')
-        duration = float(info.get('format', {}).get('duration', 0))
+        fmt = info.get('format') or {}
+        tags = fmt.get('tags') or {}
+        title = tags.get('title', '')
+        f_bytes = int(fmt.get('size', 0))
+        size = round(f_bytes / 2 ** 20, 2) if f_bytes else ''
+        bits = int(fmt.get('bit_rate', 0))
+        bitrate = round(bits / 2 ** 20, 2) if bits else ''
+        container_format = fmt.get('format_long_name', '')
+        duration = float(fmt.get('duration', 0))
         length = datetime.timedelta(0, round(duration)) if duration else ''
 
         return cls(title=title, size=size, bitrate=bitrate,
@@ -142,18 +254,24 @@ class Container(EqualityMixin):
         microseconds (:obj:`int`): The duration of the file expressed in
             microseconds.
         temp_file (:obj:`tempfile.NamedTemporaryFile`): The temporary file for
-            ffmpeg to write status information to.
+            ffmpeg to write status information to. It is created on first
+            access and removed when the instance is garbage collected or the
+            interpreter exits.
         process (:obj:`subprocess.Popen`): The subprocess in which ffmpeg
             processes the file.
-        equality_ignore (:obj:`list` of :obj:`string`): Attributes to ignore
-            when checking for equality of Container instances.
+        equality_ignore (:obj:`frozenset` of :obj:`string`): Attributes to
+            ignore when checking for equality of Container instances.
 
     """
 
+    equality_ignore = frozenset({'temp_file', '_temp_file', 'process'})
+
     def __init__(self, file_name, duration, streams, subtitle_files=None,
                  selected=None, output_name=None, labels=None):
 
         self.file_name = file_name
+        self._default_name = (os.path.splitext(os.path.basename(file_name))[0]
+                              + defaults.ENDING)
         self.duration = duration
         self.streams = streams
         self.subtitle_files = subtitle_files if subtitle_files else []
@@ -163,9 +281,8 @@ class Container(EqualityMixin):
         self.labels = labels if labels else ContainerLabel()
 
         self.microseconds = int(duration * 1000000)
-        self.temp_file = tempfile.NamedTemporaryFile(delete=False)
+        self._temp_file = None
         self.process = None
-        self.equality_ignore = ['temp_file', 'process']
 
     @classmethod
     def from_file(cls, file_name):
@@ -173,7 +290,8 @@ class Container(EqualityMixin):
 
         Attempt to probe the file with ffprobe. If the probe is succesful,
         finish instatiation by passing the results to
-        :obj:`Container.from_dict`.
+        :obj:`Container.from_dict`. The output is remembered, so probing the
+        same unchanged file again does not run ffprobe.
 
         Args:
             file_name (:obj:`str`): The file (a multimedia container) to
@@ -188,25 +306,105 @@ class Container(EqualityMixin):
 
         """
 
-        probe_response = subprocess.run(
-            [defaults.FFPROBE, '-v', 'error', '-show_format',
-             '-show_streams', '-of', 'json', file_name],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        if probe_response.returncode:
-            raise ProbeError(file_name, probe_response.stderr.decode('utf-8')
-                             .strip(os.linesep))
+        return cls.from_dict(_parse_lazy(_probe_output(file_name)))
+
+    @classmethod
+    def from_files(cls, file_names, cache=None, workers=None, ordered=False):
+        """Build :obj:`Container` instances from many multimedia files
+        concurrently.
+
+        Note:
+            The files are probed in a pool of threads rather than processes:
+            the work happens in the ffprobe subprocesses, so the GIL is not a
+            bottleneck and nothing needs to be pickled.
+
+        Args:
+            file_names (:obj:`list` of :obj:`str`): The files to represent.
+            cache (:obj:`ProbeCache`, optional): If specified, the files are
+                built with :obj:`Container.from_file_cached` using this cache.
+            workers (:obj:`int`, optional): The maximum number of files to
+                probe at once. Defaults to the number of processors, up to
+                32, or to 4 if that number can't be determined.
+            ordered (:obj:`bool`, optional): If True, the futures are yielded
+                in the order of `file_names` rather than in the order that the
+                probes complete.
+
+        Yields:
+            :obj:`concurrent.futures.Future`: The future for each file. The
+            result of each future is a :obj:`Container`, or
+            :obj:`ProbeError` is raised.
+
+        """
 
-        info = json.loads(probe_response.stdout)
-        return cls.from_dict(info)
+        workers = workers if workers else min(32, os.cpu_count() or 4)
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            if cache:
+                futures = [executor.submit(cls.from_file_cached, file_name,
+                                           cache)
+                           for file_name in file_names]
+            else:
+                futures = [executor.submit(cls.from_file, file_name)
+                           for file_name in file_names]
+            try:
+                if ordered:
+                    yield from futures
+                else:
+                    yield from concurrent.futures.as_completed(futures)
+            finally:
+                # If the caller stops early, don't wait on the queued probes
+                # when the executor shuts down.
+                for future in futures:
+                    future.cancel()
 
     @classmethod
-    def from_dict(cls, info):
+    def from_file_cached(cls, file_name, cache):
+        """Build a :obj:`Container` from a given multimedia file, reusing
+        cached ffprobe output if the file has not changed since it was last
+        probed.
+
+        Args:
+            file_name (:obj:`str`): The file (a multimedia container) to
+                represent.
+            cache (:obj:`ProbeCache`): The cache to check and update.
+
+        Returns:
+            :obj:`Container`: Instance representing the given file.
+
+        Raises:
+            :obj:`ProbeError`: If ffprobe is unable to successfully probe the
+                file.
+
+        """
+
+        key = cache.key(file_name)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                output = _probe_output(file_name)
+            except ProbeError as _e:
+                cache.set(key, error=_e.message)
+                raise
+            cache.set(key, output)
+        else:
+            output, error = entry
+            if error is not None:
+                raise ProbeError(file_name, error)
+
+        return cls.from_dict(_parse_lazy(output), file_name)
+
+    @classmethod
+    def from_dict(cls, info, file_name=None, streams=None):
         """Build a :obj:`Container` from a given dictionary.
 
         Args:
             info (:obj:`dict`): Container information in dictionary format
                 structured in the manner of ffprobe json output.
+            file_name (:obj:`str`, optional): If specified, used in place of
+                the filename in the info, such as when the info was cached
+                for the same file under a different relative path.
+            streams (:obj:`list` of :obj:`Stream`, optional): If specified,
+                used in place of building streams from the info, such as when
+                they have already been built from a stream of json.
 
         Returns:
             :obj:`Container`: Instance representing the given info.
@@ -216,40 +414,91 @@ class Container(EqualityMixin):
 
         """
 
-        file_name = info['format']['filename']
+        file_name = file_name if file_name else info['format']['filename']
         duration = float(info.get('format', {}).get('duration', 0))
         if not duration:
             raise ProbeError(file_name, 'File has no duration tag.')
 
-        streams = [Stream.from_dict(stream) for stream in info['streams']]
+        if streams is None:
+            streams = [cls.stream_from_dict(stream)
+                       for stream in info['streams']]
         labels = ContainerLabel.from_dict(info)
 
         return cls(file_name=file_name, duration=duration, streams=streams,
                    labels=labels)
 
+    @classmethod
+    def from_json_stream(cls, json_file):
+        """Build a :obj:`Container` from ffprobe json output, parsing it
+        incrementally.
+
+        Each :obj:`Stream` is built as soon as its entry has been parsed, so
+        the information for only one stream is held as a dictionary at a
+        time. This requires ijson; without it the whole output is parsed at
+        once.
+
+        Args:
+            json_file (file object): ffprobe json output, opened in binary
+                mode.
+
+        Returns:
+            :obj:`Container`: Instance representing the given output.
+
+        Raises:
+            :obj:`ProbeError`: If the output does not contain a 'duraton' tag.
+
+        """
+
+        if ijson is None:
+            return cls.from_dict(_parse_lazy(json_file.read()))
+
+        streams = []
+        info = {}
+        builder = None
+        for prefix, event, value in ijson.parse(json_file):
+            if event == 'start_map' and prefix in ('streams.item', 'format'):
+                builder = ijson.ObjectBuilder()
+            if builder is None:
+                continue
+            builder.event(event, value)
+            if event == 'end_map' and prefix == 'streams.item':
+                streams.append(cls.stream_from_dict(builder.value))
+                builder = None
+            elif event == 'end_map' and prefix == 'format':
+                info['format'] = builder.value
+                builder = None
+
+        return cls.from_dict(info, streams=streams)
+
+    @staticmethod
+    def stream_from_dict(info):
+        """Build a :obj:`Stream` for this class of container.
+
+        Args:
+            info (:obj:`dict`): Stream information in dictionary format
+                structured in the manner of ffprobe json output.
+
+        Returns:
+            :obj:`Stream`: Instance populated with data from the given
+            dictionary.
+
+        """
+
+        return Stream.from_dict(info)
+
     @property
     def default_name(self):
         """:obj:`str`: The input filename reformatted with the selected output
-        file extension."""
+        file extension, as of instantiation."""
 
-        return pathlib.PurePath(self.file_name).stem + defaults.ENDING
+        return self._default_name
 
     @property
     def default_streams(self):
         """:obj:`list` of :obj:`int`: The indexes of the first video and audio
         :obj:`Stream`."""
 
-        streams = []
-        audio, video = None, None
-        for stream in self.streams:
-            if not audio and stream.type == 'audio':
-                audio = True
-                streams.append(stream.index)
-            elif not video and stream.type == 'video':
-                video = True
-                streams.append(stream.index)
-
-        return streams
+        return self._default_streams
 
     @property
     def selected(self):
@@ -272,22 +521,66 @@ class Container(EqualityMixin):
     @selected.setter
     def selected(self, index_list):
 
-        streams = self.streams_dict
+        streams = self._streams_dict
         for index in index_list:
-            if index not in streams.keys():
+            if index not in streams:
                 raise ValueError('This contaner does not contain a stream '
                                  'with index {}'.format(index))
-            if streams[index].type not in ['audio', 'video', 'subtitle']:
+            if streams[index].type not in ('audio', 'video', 'subtitle'):
                 raise ValueError('filmalize cannot output streams of type {}'
                                  .format(streams[index].type))
 
         self._selected = sorted(index_list)
 
+    @property
+    def streams(self):
+        """:obj:`list` of :obj:`Stream`: The mutimedia streams in this
+        :obj:`Container`.
+
+        Note:
+            :obj:`Container.streams_dict` and :obj:`Container.default_streams`
+            are rebuilt when this attribute is set, so assign a new list rather
+            than modifying it in place.
+
+        """
+
+        return self._streams
+
+    @streams.setter
+    def streams(self, streams):
+
+        self._streams = streams
+        self._streams_dict = {stream.index: stream for stream in streams}
+
+        self._default_streams = []
+        found = set()
+        for stream in streams:
+            if stream.type in ('audio', 'video') and stream.type not in found:
+                found.add(stream.type)
+                self._default_streams.append(stream.index)
+                if len(found) == 2:
+                    break
+
     @property
     def streams_dict(self):
         """:obj:`dict` of {:obj:`int`: :obj:`Stream`}: The :obj:`Stream`
         instances in :obj:`Container.streams` keyed by their indexes."""
-        return {stream.index: stream for stream in self.streams}
+        return self._streams_dict
+
+    @property
+    def temp_file(self):
+        """:obj:`tempfile.NamedTemporaryFile`: The temporary file for ffmpeg
+        to write status information to."""
+
+        if self._temp_file is None:
+            self._temp_file = tempfile.NamedTemporaryFile(delete=False)
+            weakref.finalize(self, _remove_temp_file, self._temp_file)
+        return self._temp_file
+
+    @temp_file.setter
+    def temp_file(self, temp_file):
+
+        self._temp_file = temp_file
 
     @property
     def progress(self):
@@ -303,20 +596,20 @@ class Container(EqualityMixin):
         elif self.process.poll() is not None:
             raise ProgressFinishedError
         else:
-            try:
-                self.temp_file.seek(-512, os.SEEK_END)
-            except OSError:
-                self.temp_file.seek(0)
-            binary_lines = self.temp_file.readlines(512)
-            line_list = [_l.decode().strip(os.linesep) for _l in binary_lines]
-
-            microsec = 0
-            for line in reversed(line_list):
-                if line.split('=')[0] == 'out_time_ms':
-                    microsec = int(line.split('=')[1])
-                    break
-
-            return microsec
+            with open(self.temp_file.name, 'rb') as progress_file:
+                try:
+                    progress_file.seek(-512, os.SEEK_END)
+                except OSError:
+                    progress_file.seek(0)
+                data = progress_file.read(512)
+
+            # Only consider complete lines, ffmpeg may be mid-write.
+            end = data.rfind(b'\n')
+            start = data.rfind(b'out_time_ms=', 0, max(end, 0))
+            if start == -1:
+                return 0
+            start += len(b'out_time_ms=')
+            return int(data[start:data.index(b'\n', start)])
 
     def add_subtitle_file(self, file_name, encoding=None):
         """Add an external subtitle file. Optionally set a custom file
@@ -351,27 +644,28 @@ class Container(EqualityMixin):
 
         """
 
+        streams = self._streams_dict
         command = [defaults.FFMPEG, '-nostdin', '-progress',
                    self.temp_file.name, '-v', 'error', '-y', '-i',
                    self.file_name]
         for subtitle in self.subtitle_files:
-            command.extend(['-sub_charenc', subtitle.encoding, '-i',
-                            subtitle.file_name])
-        for stream in self.selected:
-            command.extend(['-map', '0:{}'.format(stream)])
-        for index, _ in enumerate(self.subtitle_files):
-            command.extend(['-map', '{}:0'.format(index + 1)])
+            command += ['-sub_charenc', subtitle.encoding, '-i',
+                        subtitle.file_name]
+        command += [arg for index in self.selected
+                    for arg in ('-map', '0:' + str(index))]
+        command += [arg for number in range(1, len(self.subtitle_files) + 1)
+                    for arg in ('-map', str(number) + ':0')]
         stream_number = {'video': 0, 'audio': 0, 'subtitle': 0}
-        output_streams = [s for s in self.streams if s.index in self.selected]
-        for stream in output_streams:
-            command.extend(stream.build_options(stream_number[stream.type]))
+        for index in self.selected:
+            stream = streams[index]
+            command += stream.build_options(stream_number[stream.type])
             stream_number[stream.type] += 1
-        for subtitle in self.subtitle_files:
-            command.extend(['-c:s:{}'.format(stream_number['subtitle'])])
-            command.extend(subtitle.options)
-            stream_number['subtitle'] += 1
-        command.extend([os.path.join(os.path.dirname(self.file_name),
-                                     self.output_name)])
+        for number, subtitle in enumerate(self.subtitle_files,
+                                          stream_number['subtitle']):
+            command.append('-c:s:' + str(number))
+            command += subtitle.options
+        command.append(os.path.join(os.path.dirname(self.file_name),
+                                    self.output_name))
 
         return command
 
@@ -432,20 +726,21 @@ class StreamLabel(EqualityMixin):
         """
 
         stream_type = info['codec_type']
-        title = info.get('tags', {}).get('title', '')
+        tags = info.get('tags') or {}
+        title = tags.get('title', '')
         bits = int(info.get('bit_rate', 0))
         if stream_type == 'video' and bits:
-            bitrate = round(bitmath.Mib(bits=bits).value, 2)
+            bitrate = round(bits / 2 ** 20, 2)
         elif stream_type == 'audio' and bits:
-            bitrate = round(bitmath.Kib(bits=bits).value)
+            bitrate = round(bits / 2 ** 10)
         else:
             bitrate = ''
         height = str(info.get('height', info.get('coded_height', '')))
         width = str(info.get('width', info.get('coded_width', '')))
         resolution = width + 'x' + height if height and width else ''
-        language = info.get('tags', {}).get('language', '')
+        language = tags.get('language', '')
         channels = info.get('channel_layout', '')
-        default = bool(info.get('disposition', {}).get('default'))
+        default = bool((info.get('disposition') or {}).get('default'))
 
         return cls(title=title, bitrate=bitrate, resolution=resolution,
                    language=language, channels=channels, default=default)
@@ -560,42 +855,38 @@ class Stream(EqualityMixin):
 
         """
 
-        options = []
+        number = str(number)
         if self.type == 'video':
-            options.extend(['-c:v:{}'.format(number)])
-            if self.custom_crf or self.codec != defaults.C_VIDEO:
-                crf = (self.custom_crf if self.custom_crf
-                       else defaults.CRF)
-                options.extend(['libx264', '-preset', defaults.PRESET, '-crf',
-                                str(crf), '-pix_fmt', 'yuv420p'])
-                self.option_summary = ('transcode -> {}, crf={}'
-                                       .format(defaults.C_VIDEO, crf))
-            else:
-                options.extend(['copy'])
-                self.option_summary = 'copy'
+            c_video = defaults.C_VIDEO
+            if self.custom_crf or self.codec != c_video:
+                crf = str(self.custom_crf if self.custom_crf else defaults.CRF)
+                self.option_summary = ('transcode -> ' + c_video + ', crf='
+                                       + crf)
+                return ['-c:v:' + number, 'libx264', '-preset',
+                        defaults.PRESET, '-crf', crf, '-pix_fmt', 'yuv420p']
+            self.option_summary = 'copy'
+            return ['-c:v:' + number, 'copy']
         elif self.type == 'audio':
-            options.extend(['-c:a:{}'.format(number)])
-            if self.custom_bitrate or self.codec != defaults.C_AUDIO:
-                bitrate = (self.custom_bitrate if self.custom_bitrate
-                           else self.labels.bitrate if self.labels.bitrate
-                           else defaults.BITRATE)
-                options.extend([defaults.C_AUDIO, '-b:a:{}'.format(number),
-                                '{}k'.format(bitrate)])
-                self.option_summary = ('transcode -> {}, bitrate={}Kib/s'
-                                       .format(defaults.C_AUDIO, bitrate))
-            else:
-                options.extend(['copy'])
-                self.option_summary = 'copy'
+            c_audio = defaults.C_AUDIO
+            if self.custom_bitrate or self.codec != c_audio:
+                bitrate = str(self.custom_bitrate if self.custom_bitrate
+                              else self.labels.bitrate if self.labels.bitrate
+                              else defaults.BITRATE)
+                self.option_summary = ('transcode -> ' + c_audio + ', bitrate='
+                                       + bitrate + 'Kib/s')
+                return ['-c:a:' + number, c_audio, '-b:a:' + number,
+                        bitrate + 'k']
+            self.option_summary = 'copy'
+            return ['-c:a:' + number, 'copy']
         elif self.type == 'subtitle':
-            options.extend(['-c:s:{}'.format(number)])
-            if self.codec == defaults.C_SUBS:
-                options.extend(['copy'])
+            c_subs = defaults.C_SUBS
+            if self.codec == c_subs:
                 self.option_summary = 'copy'
-            else:
-                options.extend([defaults.C_SUBS])
-                self.option_summary = 'transcode -> {}'.format(defaults.C_SUBS)
+                return ['-c:s:' + number, 'copy']
+            self.option_summary = 'transcode -> ' + c_subs
+            return ['-c:s:' + number, c_subs]
 
-        return options
+        return []
 
 
 class SubtitleFile(EqualityMixin):
@@ -623,8 +914,10 @@ class SubtitleFile(EqualityMixin):
     def guess_encoding(self):
         """Guess the encoding of the subtitle file.
 
-        Open the given file, read a line, and pass that line to
-        :obj:`chardet.detect` to produce a guess at the file's encoding.
+        Open the given file, read the first ten lines, and pass them to
+        :obj:`detect` to produce a guess at the file's encoding. ``detect``
+        comes from cchardet or charset_normalizer if either is installed, or
+        else from chardet.
 
         Returns:
             str: The best guess for the subtitle file encoding.
@@ -632,5 +925,144 @@ class SubtitleFile(EqualityMixin):
         """
         with open(self.file_name, mode='rb') as _file:
             lines = [_file.readline() for _ in range(10)]
-        detected = chardet.detect(b''.join(lines))
+        detected = detect(b''.join(lines))
         return detected['encoding']
+
+
+class ProbeCache(object):
+    """Persistent store of ffprobe output.
+
+    Entries are keyed by the absolute path, modification time, and size of the
+    probed file, so a changed file is simply a cache miss. The error message is
+    stored for files that ffprobe failed on, so that files which are not
+    multimedia are not probed again on every run. A single sqlite connection
+    is shared between threads and guarded by a lock.
+
+    Note:
+        If the cache database cannot be opened or written to, the cache
+        silently behaves as if it were empty.
+
+    Args:
+        path (:obj:`str`, optional): The database file. If not specified,
+            :obj:`defaults.PROBE_CACHE` is used.
+
+    Attributes:
+        path (:obj:`str`): The database file.
+        version (:obj:`int`): The layout of the stored entries. A database
+            with a different version, or written with different
+            :obj:`PROBE_ENTRIES`, is emptied when it is opened.
+
+    """
+
+    version = 2
+
+    def __init__(self, path=None):
+
+        self.path = os.path.expanduser(path if path else defaults.PROBE_CACHE)
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @staticmethod
+    def key(file_name):
+        """Build the cache key for a file.
+
+        Args:
+            file_name (:obj:`str`): The file to build a key for.
+
+        Returns:
+            :obj:`tuple`: The absolute path, modification time in nanoseconds,
+            and size of the file, or None if the file cannot be read.
+
+        """
+
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return None
+        return (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key):
+        """Look up cached ffprobe output.
+
+        Args:
+            key (:obj:`tuple`): A key built with :obj:`ProbeCache.key`.
+
+        Returns:
+            :obj:`tuple`: The cached raw ffprobe json output and ffprobe error
+            message, one of which is None, or None on a miss.
+
+        """
+
+        if key is None:
+            return None
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    'SELECT info, error FROM probes '
+                    'WHERE path = ? AND mtime = ? AND size = ?', key
+                ).fetchone()
+            except (sqlite3.Error, OSError):
+                return None
+        return tuple(row) if row else None
+
+    def set(self, key, output=None, error=None):
+        """Store ffprobe output.
+
+        Args:
+            key (:obj:`tuple`): A key built with :obj:`ProbeCache.key`.
+            output (:obj:`bytes`, optional): The raw ffprobe json output to
+                store.
+            error (:obj:`str`, optional): The ffprobe error message to store,
+                if the probe failed.
+
+        """
+
+        if key is None:
+            return
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)',
+                        key + (output, error)
+                    )
+            except (sqlite3.Error, OSError):
+                pass
+
+    def close(self):
+        """Close the database connection, if open."""
+
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def _schema(self):
+        """Combine the version and the ffprobe entries into a sqlite
+        user_version."""
+
+        schema = '{}:{}'.format(self.version, PROBE_ENTRIES).encode()
+        return zlib.crc32(schema) & 0x7fffffff
+
+    def _connect(self):
+        if not self._connection:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Entries written in another layout, or with other ffprobe
+            # entries, are simply discarded.
+            schema = self._schema()
+            stored = connection.execute('PRAGMA user_version').fetchone()[0]
+            if stored != schema:
+                with connection:
+                    connection.execute('DROP TABLE IF EXISTS probes')
+                    connection.execute(
+                        'PRAGMA user_version = {}'.format(schema))
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, '
+                'mtime INTEGER, size INTEGER, info BLOB, error TEXT)'
+            )
+            self._connection = connection
+        return self._connection
@@ -8,8 +8,11 @@ setup(
     packages=['filmalize'],
     include_package_data=True,
     install_requires=[
-        'click', 'bitmath', 'colorama', 'chardet', 'blessed', 'progressbar2'
+        'click', 'colorama', 'chardet', 'blessed', 'progressbar2'
     ],
+    extras_require={
+        'fast': ['orjson', 'pysimdjson', 'ijson', 'charset-normalizer'],
+    },
     entry_points='''
         [console_scripts]
         filmalize=filmalize.cli:cli
@@ -0,0 +1,49 @@
+"""Unit tests for filmalize.cli"""
+
+import os
+
+from filmalize.cli import walk_directory
+
+
+class TestWalkDirectory:
+    """Test the walk_directory function."""
+
+    def test_nested(self, tmpdir):
+        """Ensure that files in nested directories are all found."""
+        tmpdir.join('a.mkv').write('')
+        tmpdir.mkdir('one').join('b.mkv').write('')
+        tmpdir.join('one').mkdir('two').join('c.mkv').write('')
+        tmpdir.mkdir('empty')
+        assert sorted(walk_directory(str(tmpdir))) == [
+            str(tmpdir.join('a.mkv')),
+            str(tmpdir.join('one', 'b.mkv')),
+            str(tmpdir.join('one', 'two', 'c.mkv')),
+        ]
+
+    def test_symlinks(self, tmpdir):
+        """Ensure that symlinked files are listed but symlinked directories are
+        not descended into."""
+        library = tmpdir.mkdir('library')
+        library.join('real.mkv').write('')
+        library.join('link.mkv').mksymlinkto(library.join('real.mkv'))
+        tmpdir.mkdir('other').join('hidden.mkv').write('')
+        library.join('other').mksymlinkto(tmpdir.join('other'))
+        assert sorted(walk_directory(str(library))) == [
+            str(library.join('link.mkv')),
+            str(library.join('real.mkv')),
+        ]
+
+    def test_unreadable(self, tmpdir, monkeypatch):
+        """Ensure that directories that cannot be read are skipped."""
+        tmpdir.join('a.mkv').write('')
+        locked = tmpdir.mkdir('locked')
+        locked.join('b.mkv').write('')
+        scandir = os.scandir
+
+        def mockscandir(path):
+            if path == str(locked):
+                raise PermissionError(path)
+            return scandir(path)
+
+        monkeypatch.setattr(os, 'scandir', mockscandir)
+        assert walk_directory(str(tmpdir)) == [str(tmpdir.join('a.mkv'))]
@@ -0,0 +1,123 @@
+"""Unit tests for filmalize.cli_models"""
+
+import contextlib
+import io
+
+import pytest
+
+from filmalize.cli_models import CliContainer, ErrorWriter, Writer
+
+
+class StubTerminal:
+    """Mock blessed Terminal with fixed dimensions and no styling."""
+
+    width = 20
+    height = 10
+    clear_eol = ''
+
+    def __init__(self):
+        self.locations = []
+
+    @staticmethod
+    def move(line, column):
+        """Mock move method."""
+        return '<{},{}>'.format(line, column)
+
+    @staticmethod
+    def red(message):
+        """Mock color method."""
+        return message
+
+    @staticmethod
+    def length(text):
+        """Mock length method."""
+        return len(text)
+
+    @contextlib.contextmanager
+    def location(self, x, y):
+        """Mock location method, recording the line written to."""
+        self.locations.append(y)
+        yield
+
+
+class StubProgressBar:
+    """Mock ProgressBar that records its updates."""
+
+    def __init__(self):
+        self.updates = []
+
+    def update(self, value):
+        """Mock update method."""
+        self.updates.append(value)
+
+
+@pytest.fixture
+def example_cli_container():
+    """Return a ten second CliContainer with a mock progress bar."""
+    return CliContainer(file_name='example.ogv', duration=10, streams=[],
+                        pr_bar=StubProgressBar())
+
+
+class TestWriter:
+    """Test the Writer class."""
+
+    def test_write(self):
+        """Ensure that Writer.write moves to its line and buffers the
+        message."""
+        buffer = io.StringIO()
+        writer = Writer(3, StubTerminal(), 'red', buffer)
+        writer.write('hello')
+        assert buffer.getvalue() == '<3,0>hello\n'
+
+    def test_write_repeated(self):
+        """Ensure that a message identical to the previous one is not written
+        again."""
+        buffer = io.StringIO()
+        writer = Writer(3, StubTerminal(), buffer=buffer)
+        writer.write('hello')
+        writer.write('hello')
+        assert buffer.getvalue() == '<3,0>hello\n'
+        writer.write('goodbye')
+        writer.write('hello')
+        assert buffer.getvalue() == '<3,0>hello\n<3,0>goodbye\n<3,0>hello\n'
+
+
+class TestErrorWriter:
+    """Test the ErrorWriter class."""
+
+    def test_write_order(self, capsys):
+        """Ensure that messages are written downward in the order given,
+        allowing for multiple and wrapped lines."""
+        terminal = StubTerminal()
+        err = ErrorWriter(terminal, 2)
+        err.write('header')
+        err.write('one\ntwo')
+        err.write('x' * 25)
+        err.write('last')
+        assert terminal.locations == [2, 3, 5, 7]
+        assert err.line == 8
+        assert capsys.readouterr().out.startswith('header\none\ntwo\n')
+
+    def test_write_bottom(self, capsys):
+        """Ensure that messages which do not fit above the bottom of the
+        terminal are kept but not written."""
+        terminal = StubTerminal()
+        err = ErrorWriter(terminal, 7)
+        err.write('one')
+        err.write('two\nthree')
+        err.write('four')
+        assert terminal.locations == [7]
+        assert err.messages == ['one', 'two\nthree', 'four']
+        assert capsys.readouterr().out == 'one\n'
+
+
+class TestCliContainer:
+    """Test the CliContainer class."""
+
+    def test_update_progress(self, example_cli_container):
+        """Ensure that the progress bar is only updated when the whole
+        percentage completed changes."""
+        for progress in [0, 50000, 99999, 100000, 150000, 300000, 300001]:
+            example_cli_container.update_progress(progress)
+        assert example_cli_container.pr_bar.updates == [0, 100000, 300000]
+        assert example_cli_container.percent == 3
@@ -4,19 +4,24 @@ import datetime
 import json
 import os
 import subprocess
+import time
 from collections import namedtuple
 from itertools import permutations
 
 import pytest
 
 import filmalize.defaults as defaults
-from filmalize.errors import ProgressFinishedError
-from filmalize.models import (Container, ContainerLabel, Stream, StreamLabel,
-                              SubtitleFile)
+import filmalize.models as models
+from filmalize.errors import ProbeError, ProgressFinishedError
+from filmalize.models import (PROBE_ENTRIES, Container, ContainerLabel,
+                              ProbeCache, Stream, StreamLabel, SubtitleFile)
 
 with open('example.json') as example_file:
     EXAMPLE = json.load(example_file)
 
+with open('example.json', 'rb') as example_file:
+    EXAMPLE_OUTPUT = example_file.read()
+
 FAKE_CODEC = '_not_a_thing_'
 
 
@@ -426,7 +431,8 @@ class TestContainer:
         attrs = {'subtitle_files': [], 'microseconds': 233121000,
                  'output_name': 'test_film' + defaults.ENDING,
                  'selected': [1], 'labels': ContainerLabel(), 'process': None,
-                 'equality_ignore': ['temp_file', 'process']}
+                 'equality_ignore': frozenset({'temp_file', '_temp_file',
+                                               'process'})}
         for attr, value in attrs.items():
             assert getattr(built, attr) == value
 
@@ -448,7 +454,8 @@ class TestContainer:
                  'subtitle_files': [], 'selected': [0, 1], 'process': None,
                  'output_name': 'examplefile' + defaults.ENDING,
                  'labels': example_container_label, 'microseconds': 186727000,
-                 'equality_ignore': ['temp_file', 'process']}
+                 'equality_ignore': frozenset({'temp_file', '_temp_file',
+                                               'process'})}
         for attr, value in attrs.items():
             assert getattr(example_container, attr) == value
 
@@ -457,25 +464,122 @@ class TestContainer:
         example.json."""
         assert example_container == Container.from_dict(EXAMPLE)
 
+    def test_match_example_from_json_stream(self, example_container):
+        """Ensure that Container.from_json_stream builds an instance that
+        matches the example."""
+        with open('example.json', 'rb') as example_file:
+            assert example_container == Container.from_json_stream(
+                example_file)
+
+    def test_match_example_from_json_stream_fallback(self, example_container,
+                                                     monkeypatch):
+        """Ensure that Container.from_json_stream builds an instance that
+        matches the example when ijson is not installed."""
+        monkeypatch.setattr(models, 'ijson', None)
+        with open('example.json', 'rb') as example_file:
+            assert example_container == Container.from_json_stream(
+                example_file)
+
     def test_match_example_from_file(self, example_container, monkeypatch):
         """Ensure that Container.from_file builds an instance that matches the
         example."""
 
-        def mockreturn(commands, stdout, stderr):
+        def mockreturn(commands, stdout, stderr, close_fds):
             """Ensure that the ffprobe command is properly formatted. Return a
             mock ffprobe response based on example.json."""
             assert commands == [defaults.FFPROBE, '-v', 'error',
-                                '-show_format', '-show_streams', '-of', 'json',
+                                '-show_entries', PROBE_ENTRIES, '-of', 'json',
                                 'example.ogv']
             with open('example.json') as example_file:
                 example_text = '\n'.join(example_file.readlines())
 
+            assert close_fds is True
             probe = namedtuple('probe', ['returncode', 'stdout'])
             return probe(False, example_text)
 
         monkeypatch.setattr(subprocess, 'run', mockreturn)
         assert example_container == Container.from_file('example.ogv')
 
+    def test_from_file_memoized(self, tmpdir, monkeypatch):
+        """Ensure that Container.from_file only runs ffprobe again on a file
+        once it has changed."""
+        probed = []
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Record the probe and return a mock ffprobe response."""
+            probed.append(commands[-1])
+            probe = namedtuple('probe', ['returncode', 'stdout'])
+            return probe(False, EXAMPLE_OUTPUT)
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        media = tmpdir.join('example.ogv')
+        media.write('a')
+        Container.from_file(str(media))
+        Container.from_file(str(media))
+        assert len(probed) == 1
+        media.write('ab')
+        Container.from_file(str(media))
+        assert len(probed) == 2
+
+    def test_match_example_from_files(self, example_container, monkeypatch):
+        """Ensure that Container.from_files builds an instance matching the
+        example for each file."""
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Return a mock ffprobe response based on example.json."""
+            with open('example.json') as example_file:
+                example_text = '\n'.join(example_file.readlines())
+
+            probe = namedtuple('probe', ['returncode', 'stdout'])
+            return probe(False, example_text)
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        futures = list(Container.from_files(['a.ogv', 'b.ogv', 'c.ogv']))
+        assert len(futures) == 3
+        for future in futures:
+            assert example_container == future.result()
+
+    def test_from_files_close(self, monkeypatch):
+        """Ensure that probes which have not started are cancelled when the
+        Container.from_files generator is closed early."""
+        probed = []
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Record the probe and return a mock ffprobe response."""
+            probed.append(commands[-1])
+            time.sleep(0.01)
+            with open('example.json', 'rb') as example_file:
+                example_text = example_file.read()
+
+            probe = namedtuple('probe', ['returncode', 'stdout'])
+            return probe(False, example_text)
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        file_names = ['{}.ogv'.format(number) for number in range(40)]
+        futures = Container.from_files(file_names, workers=1)
+        next(futures)
+        futures.close()
+        assert len(probed) < len(file_names)
+
+    def test_from_files_ordered(self, monkeypatch):
+        """Ensure that Container.from_files yields futures in the order of the
+        file names when ordered is set, however the probes complete."""
+        file_names = ['{}.ogv'.format(number) for number in range(4)]
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Return a mock ffprobe response, slower for earlier files."""
+            position = file_names.index(commands[-1])
+            time.sleep(0.01 * (len(file_names) - position))
+            info = json.loads(json.dumps(EXAMPLE))
+            info['format']['filename'] = commands[-1]
+
+            probe = namedtuple('probe', ['returncode', 'stdout'])
+            return probe(False, json.dumps(info).encode())
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        futures = Container.from_files(file_names, ordered=True)
+        assert [future.result().file_name for future in futures] == file_names
+
     def test_streams_dict(self, example_container):
         """Ensure that the streams_dict property properly numbers and includes
         Streams."""
@@ -501,6 +605,17 @@ class TestContainer:
             running_example_container.temp_file = mock_file(temp_file)
             assert running_example_container.progress == progress
 
+    def test_progress_partial_line(self, running_example_container, tmpdir):
+        """Ensure that the progress property ignores a progress line that
+        ffmpeg has not finished writing."""
+        mock_file = namedtuple('temp_file', ['name'])
+        progress_file = tmpdir.join('progress.tmp')
+        running_example_container.temp_file = mock_file(str(progress_file))
+        progress_file.write('out_time_ms=1000\nout_time_ms=20')
+        assert running_example_container.progress == 1000
+        progress_file.write('out_time_ms=20')
+        assert running_example_container.progress == 0
+
     def test_selected(self, example_container):
         """Ensure that all combinations of streams from the example Container
         can be selected."""
@@ -585,3 +700,115 @@ class TestContainer:
         monkeypatch.setattr(subprocess, 'Popen', mockreturn)
         example_container.convert()
         assert example_container.process is True
+
+
+class TestProbeCache:
+    """Test the ProbeCache class."""
+
+    def test_round_trip(self, tmpdir):
+        """Ensure that stored ffprobe output is returned for an unchanged
+        file."""
+        cache = ProbeCache(str(tmpdir.join('cache', 'probe.db')))
+        key = cache.key('example.json')
+        assert cache.get(key) is None
+        cache.set(key, EXAMPLE_OUTPUT)
+        assert cache.get(key) == (EXAMPLE_OUTPUT, None)
+        cache.close()
+
+    def test_bare_file_name(self, tmpdir, monkeypatch):
+        """Ensure that a database path without a directory can be used."""
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('example.ogv').write('a')
+        cache = ProbeCache('probe.db')
+        key = cache.key('example.ogv')
+        cache.set(key, EXAMPLE_OUTPUT)
+        assert cache.get(key) == (EXAMPLE_OUTPUT, None)
+        cache.close()
+
+    def test_changed_file(self, tmpdir):
+        """Ensure that a file that has changed since it was stored is a
+        miss."""
+        media = tmpdir.join('example.ogv')
+        media.write('a')
+        cache = ProbeCache(str(tmpdir.join('probe.db')))
+        cache.set(cache.key(str(media)), EXAMPLE_OUTPUT)
+        media.write('ab')
+        assert cache.get(cache.key(str(media))) is None
+        cache.close()
+
+    def test_container_hit(self, tmpdir, example_container, monkeypatch):
+        """Ensure that Container.from_file_cached builds a Container from
+        cached output without running ffprobe."""
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Fail, since ffprobe should not be run."""
+            raise AssertionError('ffprobe was run')
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        media = tmpdir.join('example.ogv')
+        media.write('a')
+        cache = ProbeCache(str(tmpdir.join('probe.db')))
+        cache.set(cache.key(str(media)), EXAMPLE_OUTPUT)
+        container = Container.from_file_cached(str(media), cache)
+        assert container.file_name == str(media)
+        assert container.streams == example_container.streams
+        cache.close()
+
+    def test_error_hit(self, tmpdir, monkeypatch):
+        """Ensure that a failed probe is stored, and raised again for an
+        unchanged file without running ffprobe."""
+        probed = []
+
+        def mockreturn(commands, stdout, stderr, close_fds):
+            """Record the probe and return a mock ffprobe failure."""
+            probed.append(commands[-1])
+            probe = namedtuple('probe', ['returncode', 'stdout', 'stderr'])
+            return probe(1, b'', b'Invalid data found when processing input')
+
+        monkeypatch.setattr(subprocess, 'run', mockreturn)
+        text = tmpdir.join('notes.txt')
+        text.write('a')
+        cache = ProbeCache(str(tmpdir.join('probe.db')))
+        for _ in range(2):
+            with pytest.raises(ProbeError) as excinfo:
+                Container.from_file_cached(str(text), cache)
+            assert excinfo.value.file_name == str(text)
+            assert excinfo.value.message == (
+                'Invalid data found when processing input')
+        assert probed == [str(text)]
+        cache.close()
+
+    def test_old_version(self, tmpdir, monkeypatch):
+        """Ensure that entries stored in a different layout are discarded."""
+        media = tmpdir.join('example.ogv')
+        media.write('a')
+        path = str(tmpdir.join('probe.db'))
+        cache = ProbeCache(path)
+        cache.set(cache.key(str(media)), EXAMPLE_OUTPUT)
+        cache.close()
+        monkeypatch.setattr(ProbeCache, 'version', ProbeCache.version + 1)
+        cache = ProbeCache(path)
+        assert cache.get(cache.key(str(media))) is None
+        cache.close()
+
+    def test_other_entries(self, tmpdir, monkeypatch):
+        """Ensure that output stored with different ffprobe entries is
+        discarded."""
+        media = tmpdir.join('example.ogv')
+        media.write('a')
+        path = str(tmpdir.join('probe.db'))
+        cache = ProbeCache(path)
+        cache.set(cache.key(str(media)), EXAMPLE_OUTPUT)
+        cache.close()
+        monkeypatch.setattr(models, 'PROBE_ENTRIES',
+                            PROBE_ENTRIES + ':stream=profile')
+        cache = ProbeCache(path)
+        assert cache.get(cache.key(str(media))) is None
+        cache.close()
+
+    def test_missing_file(self, tmpdir):
+        """Ensure that a nonexistant file has no key and is never stored."""
+        cache = ProbeCache(str(tmpdir.join('probe.db')))
+        assert cache.key('not_a_file') is None
+        cache.set(None, EXAMPLE_OUTPUT)
+        assert cache.get(None) is None